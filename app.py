@@ -5,17 +5,37 @@ Usa docxcompose para combinación profesional sin páginas en blanco
 """
 
 import os
+import gc
+import atexit
+import json
+import shutil
+import hashlib
 import logging
+import time
+import tempfile
+import zipfile
 from io import BytesIO
+from copy import deepcopy
 from typing import List, Tuple, Dict, Optional
 from datetime import datetime
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from lxml import etree
 from docx import Document
-from docxcompose.composer import Composer
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.opc.part import Part
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import qn, nsdecls
+
+from config import (
+    DEFAULT_PAGE_BREAK, DEFAULT_PRESERVE_STYLES, DEFAULT_AUTO_ANALYZE,
+    MAX_FILE_SIZE_MB, MAX_DOCUMENTS, MAX_TOTAL_SIZE_MB,
+)
 
 # Configuración de logging
 logging.basicConfig(
@@ -24,6 +44,166 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Caché en disco de documentos combinados (clave: hashes de entrada + opciones)
+MERGE_CACHE_DIR = os.path.join(tempfile.gettempdir(), "docx_merge_cache")
+MERGE_CACHE_MAX_ENTRIES = 20
+MERGE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+MERGE_CACHE_MAX_AGE_S = 24 * 3600
+# Forma parte de la clave: incrementarlo al cambiar cómo se genera el resultado
+MERGE_CACHE_VERSION = 3
+
+# Cada cuántos documentos combinados se fuerza una recolección de basura
+GC_EVERY_N_DOCS = 5
+
+# Tipo MIME de los documentos .docx
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# Intervalo mínimo (segundos) entre actualizaciones de la barra de progreso
+PROGRESS_MIN_INTERVAL = 0.1
+
+# Espacios de nombres OOXML y expresiones XPath precompiladas (se compilan una sola vez)
+_NSMAP = {
+    'w': 'http://schemas.openxmlformats.org/wordprocessingml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+}
+
+# Nombres de etiqueta calificados precalculados (comparación directa de cadenas por elemento)
+_W = '{%s}' % _NSMAP['w']
+_P_TAG = _W + 'p'
+_TBL_TAG = _W + 'tbl'
+_BODY_TAG = _W + 'body'
+_SECTPR_TAG = _W + 'sectPr'
+_DRAWING_TAG = _W + 'drawing'
+_BR_TAG = _W + 'br'
+_TYPE_ATTR = _W + 'type'
+
+# Párrafo con salto de página, construido una vez y copiado en cada uso
+_PAGE_BREAK_P = parse_xml('<w:p %s><w:r><w:br w:type="page"/></w:r></w:p>' % nsdecls('w'))
+
+_XP_COUNT_TEXT_PARAS = etree.XPath(
+    'count(w:p[(w:r | w:hyperlink/w:r)/w:t[normalize-space(.)!=""]])',
+    namespaces=_NSMAP
+)
+_XP_COUNT_TABLES = etree.XPath('count(w:tbl)', namespaces=_NSMAP)
+_XP_HAS_TEXT = etree.XPath(
+    'boolean((w:r | w:hyperlink/w:r)/w:t[normalize-space(.)!=""])',
+    namespaces=_NSMAP
+)
+# Contenido (fuera de sectPr) que referencia otras partes del paquete: relaciones
+# (imágenes, vínculos, objetos...), notas al pie o al final, comentarios y numeración
+_XP_HAS_PART_REFERENCES = etree.XPath(
+    'boolean(*[not(self::w:sectPr)]/descendant-or-self::*['
+    '@r:* or self::w:footnoteReference or self::w:endnoteReference'
+    ' or self::w:commentReference or self::w:numId])',
+    namespaces=_NSMAP
+)
+# Párrafo que solo contiene un salto de página (sin texto)
+_XP_IS_PAGE_BREAK_P = etree.XPath(
+    'boolean(self::w:p[w:r/w:br[@w:type="page"]][not(.//w:t[normalize-space(.)!=""])])',
+    namespaces=_NSMAP
+)
+
+
+def _ends_with_page_break(body) -> bool:
+    """Indica si el último bloque del body (antes de sectPr) es un párrafo de salto de página"""
+    last = body[-1] if len(body) else None
+    if last is not None and last.tag == _SECTPR_TAG:
+        last = last.getprevious()
+    return last is not None and _XP_IS_PAGE_BREAK_P(last)
+
+
+def _count_body_content(body) -> Tuple[int, int]:
+    """Cuenta párrafos con texto y tablas del body con una sola evaluación XPath cada uno"""
+    return int(_XP_COUNT_TEXT_PARAS(body)), int(_XP_COUNT_TABLES(body))
+
+
+def _count_document_xml(source) -> Tuple[int, int, int, int]:
+    """
+    Cuenta párrafos con texto, tablas, imágenes y saltos de página leyendo
+    word/document.xml en streaming, en una sola pasada y sin construir el
+    modelo de objetos de python-docx.
+    
+    Párrafos y tablas: solo hijos directos del body (igual que doc.paragraphs /
+    doc.tables). Cada uno se libera tras procesarlo para mantener la memoria constante.
+    """
+    paragraphs = tables = images = page_breaks = 0
+    with zipfile.ZipFile(source) as package, package.open('word/document.xml') as xml_file:
+        for _, element in etree.iterparse(
+            xml_file, events=('end',), tag=(_P_TAG, _TBL_TAG, _DRAWING_TAG, _BR_TAG), resolve_entities=False
+        ):
+            tag = element.tag
+            # Imágenes y saltos se cierran antes que el párrafo que los contiene
+            if tag == _DRAWING_TAG:
+                images += 1
+                continue
+            if tag == _BR_TAG:
+                if element.get(_TYPE_ATTR) == 'page':
+                    page_breaks += 1
+                continue
+            parent = element.getparent()
+            if parent is None or parent.tag != _BODY_TAG:
+                continue
+            if tag == _TBL_TAG:
+                tables += 1
+            elif _XP_HAS_TEXT(element):
+                paragraphs += 1
+            element.clear()
+            while element.getprevious() is not None:
+                del parent[0]
+    return paragraphs, tables, images, page_breaks
+
+def _read_body_sectpr(source):
+    """
+    Propiedades de la última sección (tamaño de página, márgenes...) de un .docx,
+    leídas de word/document.xml en streaming sin cargar el documento.
+    
+    Se quitan las referencias a encabezados y pies (r:id), que solo existen en el origen.
+    """
+    with zipfile.ZipFile(source) as package, package.open('word/document.xml') as xml_file:
+        for _, element in etree.iterparse(
+            xml_file, events=('end',), tag=(_P_TAG, _TBL_TAG, _SECTPR_TAG), resolve_entities=False
+        ):
+            parent = element.getparent()
+            if parent is None or parent.tag != _BODY_TAG:
+                continue
+            if element.tag == _SECTPR_TAG:
+                for child in element.xpath('*[@r:*]', namespaces=_NSMAP):
+                    element.remove(child)
+                return parse_xml(etree.tostring(element))
+            element.clear()
+            while element.getprevious() is not None:
+                del parent[0]
+    return None
+
+
+def source_cache_key(source) -> str:
+    """
+    Clave estable para cachear resultados por archivo entre reruns.
+    
+    Rutas: (ruta, mtime, tamaño) sin leer el archivo. Buffers: hash BLAKE2b del contenido.
+    """
+    if isinstance(source, str):
+        stat = os.stat(source)
+        return f"path:{source}:{stat.st_mtime_ns}:{stat.st_size}"
+    data = source.getbuffer() if hasattr(source, 'getbuffer') else source
+    return "blob:" + hashlib.blake2b(data, digest_size=32).hexdigest()
+
+
+@st.cache_data(show_spinner=False)
+def _file_hash_cached(cache_key: str, _path: str) -> str:
+    """Hash BLAKE2b de un archivo en disco (en bloques), una sola vez por (ruta, mtime, tamaño)"""
+    hasher = hashlib.blake2b(digest_size=32)
+    with open(_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+@st.cache_data(show_spinner=False)
+def _analyze_cached(cache_key: str, _source) -> Tuple[int, int, int, int]:
+    """Conteos de párrafos, tablas, imágenes y saltos de página, una sola vez por archivo distinto"""
+    return _count_document_xml(_source)
+
 # Configuración de página
 st.set_page_config(
     page_title="Combinador Profesional de Documentos Word",
@@ -88,16 +268,68 @@ st.markdown("""
 
 class DocumentInfo:
     """Clase para almacenar información de un documento"""
-    def __init__(self, name: str, source_type: str, source, size: float = 0):
+    def __init__(self, name: str, source_type: str, source, size: float = 0,
+                 content_hash: Optional[str] = None, doc_id: Optional[str] = None,
+                 cache_key: Optional[str] = None):
         self.name = name
+        # Identificador único (file_id de la subida o ruta completa); el nombre puede repetirse
+        self.doc_id = doc_id or name
         self.source_type = source_type
-        self.source = source
+        # Las subidas se guardan una sola vez como bytes; cada lector abre su propia vista
+        self._blob = source.getvalue() if source_type == "upload" else None
+        self.source = None if self._blob is not None else source
         self.size = size
+        self.size_fmt = format_file_size(size)
         self.paragraphs = 0
         self.tables = 0
+        self.images = 0
+        self.page_breaks = 0
         self.is_valid = True
         self.error_message = None
         self._analyzed = False
+        self._doc = None
+        self._hash = content_hash
+        self._cache_key = cache_key
+    
+    def _open(self):
+        """Ruta del archivo o un BytesIO nuevo sobre el contenido (sin cursor compartido)"""
+        if self._blob is not None:
+            return BytesIO(self._blob)
+        return self.source
+    
+    def get_document(self) -> Document:
+        """Devuelve el documento parseado (se carga una sola vez y se reutiliza)"""
+        if self._doc is None:
+            self._doc = Document(self._open())
+        return self._doc
+    
+    @property
+    def content_hash(self) -> str:
+        """Hash BLAKE2b del contenido del archivo (los de disco quedan en caché entre reruns)"""
+        if self._hash is None:
+            if self._blob is not None:
+                self._hash = hashlib.blake2b(self._blob, digest_size=32).hexdigest()
+            else:
+                self._hash = _file_hash_cached(self.cache_key, self.source)
+        return self._hash
+    
+    @property
+    def cache_key(self) -> str:
+        """Clave de caché del archivo para los resultados de análisis"""
+        if self._cache_key is None:
+            if self._blob is not None:
+                # Misma clave que source_cache_key, reutilizando el hash si ya se conoce
+                self._cache_key = "blob:" + self.content_hash
+            else:
+                self._cache_key = source_cache_key(self.source)
+        return self._cache_key
+    
+    def read_bytes(self) -> bytes:
+        """Devuelve el contenido binario completo del archivo .docx"""
+        if self._blob is not None:
+            return self._blob
+        with open(self.source, 'rb') as f:
+            return f.read()
     
     def analyze(self):
         """Analiza el documento para obtener información detallada"""
@@ -105,15 +337,12 @@ class DocumentInfo:
             return
         
         try:
-            if self.source_type == "path":
-                doc = Document(self.source)
-            else:
-                self.source.seek(0)
-                doc = Document(self.source)
-                self.source.seek(0)
+            self.paragraphs, self.tables, self.images, self.page_breaks = _analyze_cached(
+                self.cache_key, self._open()
+            )
             
-            self.paragraphs = len([p for p in doc.paragraphs if p.text.strip()])
-            self.tables = len(doc.tables)
+            # Calcular el hash aquí aprovecha el análisis en paralelo
+            self.content_hash
             self.is_valid = True
             self._analyzed = True
             
@@ -125,7 +354,7 @@ class DocumentInfo:
 
 
 class ProfessionalDocumentMerger:
-    """Clase profesional para combinar documentos usando docxcompose"""
+    """Clase profesional para combinar documentos usando docxcompose o altChunk"""
     
     def __init__(self, progress_callback=None):
         self.progress_callback = progress_callback
@@ -135,18 +364,130 @@ class ProfessionalDocumentMerger:
             'total_tables': 0,
             'processing_time': 0
         }
+        # Documentos omitidos por error en la última combinación
+        self.skipped_docs = 0
     
     def _update_progress(self, current: int, total: int, message: str = ""):
         """Actualiza la barra de progreso"""
         if self.progress_callback:
             self.progress_callback(current, total, message)
     
+    @staticmethod
+    def _cache_key(documents: List[DocumentInfo], options: Dict) -> Optional[str]:
+        """Genera la clave de caché a partir de los archivos (en orden) y las opciones"""
+        if options.get('add_cover_page', False) and not options.get('cover_subtitle'):
+            # El subtítulo por defecto incluye la fecha actual: el resultado no es reproducible
+            return None
+        try:
+            payload = json.dumps(
+                {
+                    'version': MERGE_CACHE_VERSION,
+                    'files': [[d.name, d.content_hash] for d in documents],
+                    'opts': options,
+                },
+                sort_keys=True,
+                default=str
+            )
+        except OSError as e:
+            logger.warning(f"No se pudo calcular la clave de caché: {e}")
+            return None
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _load_cached_result(self, key: str) -> Optional[Tuple[str, Dict]]:
+        """Devuelve una copia del resultado en caché (ruta temporal, estadísticas) si existe"""
+        cached_docx = os.path.join(MERGE_CACHE_DIR, f"{key}.docx")
+        cached_stats = os.path.join(MERGE_CACHE_DIR, f"{key}.json")
+        if not (os.path.exists(cached_docx) and os.path.exists(cached_stats)):
+            return None
+        
+        try:
+            if time.time() - os.path.getmtime(cached_docx) > MERGE_CACHE_MAX_AGE_S:
+                return None
+            with open(cached_stats, encoding='utf-8') as f:
+                stats = json.load(f)
+            # Se entrega una copia: la UI elimina el archivo devuelto al descartarlo
+            with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as tmp, \
+                    open(cached_docx, 'rb') as src:
+                shutil.copyfileobj(src, tmp)
+                result_path = tmp.name
+            os.utime(cached_docx)
+            return result_path, stats
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo leer la caché {key}: {e}")
+            return None
+    
+    def _copy_single_document(self, doc_info: DocumentInfo) -> str:
+        """Copia el archivo original a un temporal, sin parsearlo ni recomponerlo"""
+        with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as tmp:
+            if doc_info.source_type == "path":
+                with open(doc_info.source, 'rb') as src:
+                    shutil.copyfileobj(src, tmp)
+            else:
+                tmp.write(doc_info.read_bytes())
+            result_path = tmp.name
+        
+        # Estadísticas del análisis en streaming (en caché por archivo)
+        doc_info.analyze()
+        if doc_info.is_valid:
+            self.stats['total_paragraphs'] = doc_info.paragraphs
+            self.stats['total_tables'] = doc_info.tables
+        return result_path
+    
+    def _write_cache_file(self, target: str, write):
+        """Escribe un archivo de la caché en un temporal único y lo renombra de forma atómica"""
+        fd, tmp_path = tempfile.mkstemp(dir=MERGE_CACHE_DIR, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, target)
+        finally:
+            remove_temp_file(tmp_path)
+    
+    def _prune_cache(self):
+        """Descarta entradas caducadas y las más antiguas que excedan el número o tamaño máximo"""
+        now = time.time()
+        entries = []
+        for entry in os.scandir(MERGE_CACHE_DIR):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > MERGE_CACHE_MAX_AGE_S:
+                # Incluye temporales abandonados por escrituras interrumpidas
+                remove_temp_file(entry.path)
+            elif entry.name.endswith('.docx'):
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        # De la más reciente a la más antigua: se conservan mientras quepan en los límites
+        entries.sort(reverse=True)
+        total_bytes = 0
+        for count, (_, size, path) in enumerate(entries, 1):
+            total_bytes += size
+            if count > MERGE_CACHE_MAX_ENTRIES or total_bytes > MERGE_CACHE_MAX_BYTES:
+                remove_temp_file(path)
+                remove_temp_file(path[:-len('.docx')] + '.json')
+    
+    def _store_cached_result(self, key: str, result_path: str):
+        """Guarda el resultado en la caché y descarta las entradas más antiguas"""
+        cached_docx = os.path.join(MERGE_CACHE_DIR, f"{key}.docx")
+        cached_stats = os.path.join(MERGE_CACHE_DIR, f"{key}.json")
+        try:
+            # Un resultado mayor que toda la caché no se guarda
+            if os.path.getsize(result_path) > MERGE_CACHE_MAX_BYTES:
+                return
+            os.makedirs(MERGE_CACHE_DIR, exist_ok=True)
+            # Escribir primero el documento; las estadísticas marcan la entrada como completa
+            def write_docx(f):
+                with open(result_path, 'rb') as src:
+                    shutil.copyfileobj(src, f)
+            self._write_cache_file(cached_docx, write_docx)
+            self._write_cache_file(cached_stats, lambda f: f.write(json.dumps(self.stats).encode('utf-8')))
+            self._prune_cache()
+        except OSError as e:
+            logger.warning(f"No se pudo guardar en caché {key}: {e}")
+    
     def _add_cover_page(self, doc: Document, options: Dict):
         """Agrega una portada profesional al documento"""
-        # Insertar al inicio
-        if len(doc.paragraphs) > 0:
-            doc.paragraphs[0].insert_paragraph_before()
-        
         # Usar add_paragraph en lugar de add_heading para evitar problemas con estilos
         title_para = doc.add_paragraph()
         title_run = title_para.add_run(options.get('cover_title', 'Documentos Combinados'))
@@ -173,8 +514,6 @@ class ProfessionalDocumentMerger:
     
     def _add_table_of_contents(self, doc: Document, documents: List[DocumentInfo]):
         """Agrega un índice de contenidos"""
-        doc.add_page_break()
-        
         # Usar párrafo en lugar de heading para evitar problemas con estilos
         toc_heading = doc.add_paragraph()
         toc_run = toc_heading.add_run('Índice de Contenidos')
@@ -187,11 +526,61 @@ class ProfessionalDocumentMerger:
             para = doc.add_paragraph()
             para.add_run(f"{idx}. {doc_info.name}")
     
+    def _add_front_matter(self, doc: Document, documents: List[DocumentInfo], options: Dict):
+        """
+        Agrega portada e índice al inicio del documento maestro antes de combinar el resto.
+        
+        Con docxcompose el maestro ya contiene el primer documento: los bloques se
+        agregan al final (add_paragraph) y después se mueven delante de su contenido.
+        """
+        add_cover = options.get('add_cover_page', False)
+        add_toc = options.get('add_table_of_contents', False)
+        if not (add_cover or add_toc):
+            return
+        
+        body = doc.element.body
+        existing_blocks = sum(1 for child in body if child.tag != _SECTPR_TAG)
+        
+        if add_cover:
+            self._add_cover_page(doc, options)
+        # El índice solo lista títulos, así que se construye antes de combinar y
+        # el resultado se guarda una única vez
+        if add_toc:
+            if add_cover:
+                doc.add_page_break()
+            self._add_table_of_contents(doc, documents)
+        if existing_blocks or options.get('add_page_break', True):
+            # Con contenido previo el salto es necesario para que empiece en página nueva
+            doc.add_page_break()
+        
+        if existing_blocks:
+            blocks = [child for child in body if child.tag != _SECTPR_TAG]
+            first_block = blocks[0]
+            for block in blocks[existing_blocks:]:
+                first_block.addprevious(block)
+    
+    def _fast_append(self, master_doc: Document, source_doc: Document, page_break: bool):
+        """
+        Copia el contenido del body sin conciliar estilos, numeración ni relaciones.
+        
+        Solo se usa con documentos sin referencias a otras partes (imágenes, vínculos,
+        notas, comentarios, listas numeradas), que quedarían rotas o apuntarían a
+        definiciones del maestro; el formato usa los estilos del maestro.
+        """
+        body = master_doc.element.body
+        sect_pr = body.sectPr
+        insert = sect_pr.addprevious if sect_pr is not None else body.append
+        if page_break:
+            insert(deepcopy(_PAGE_BREAK_P))
+        for child in source_doc.element.body.iterchildren():
+            if child.tag != _SECTPR_TAG:
+                insert(deepcopy(child))
+    
     def merge_documents(
         self,
         documents: List[DocumentInfo],
         options: Dict
-    ) -> Tuple[bytes, Dict]:
+    ) -> Tuple[str, Dict]:
         """
         Combina múltiples documentos: Documento 1 completo, siguiente página, Documento 2 completo, etc.
         
@@ -200,7 +589,7 @@ class ProfessionalDocumentMerger:
             options: Diccionario con opciones de combinación
         
         Returns:
-            Tupla con (bytes del documento, estadísticas)
+            Tupla con (ruta del archivo temporal con el documento, estadísticas)
         """
         start_time = datetime.now()
         
@@ -208,111 +597,230 @@ class ProfessionalDocumentMerger:
             raise ValueError("No hay documentos para combinar")
         
         self.stats['total_docs'] = len(documents)
+        self.skipped_docs = 0
+        
+        # Un solo documento sin portada ni índice: el resultado es el propio archivo
+        if (len(documents) == 1 and not options.get('add_cover_page', False)
+                and not options.get('add_table_of_contents', False)):
+            result_path = self._copy_single_document(documents[0])
+            self.stats['processing_time'] = (datetime.now() - start_time).total_seconds()
+            self._update_progress(1, 1, "Documento copiado sin cambios")
+            return result_path, self.stats
+        
+        # Reutilizar un resultado previo con los mismos archivos y opciones
+        cache_key = self._cache_key(documents, options)
+        cached = self._load_cached_result(cache_key) if cache_key else None
+        if cached:
+            result_path, cached_stats = cached
+            self.stats.update(cached_stats)
+            self.stats['processing_time'] = (datetime.now() - start_time).total_seconds()
+            self._update_progress(len(documents), len(documents), "Documento recuperado de la caché")
+            return result_path, self.stats
         
         try:
-            # Cargar TODOS los documentos primero para verificar que estén bien
-            loaded_docs = []
-            
-            for idx, doc_info in enumerate(documents):
-                self._update_progress(
-                    idx,
-                    len(documents),
-                    f"Cargando: {doc_info.name}..."
-                )
-                
+            final_doc = None
+            if options.get('merge_engine', 'docxcompose') == 'altchunk':
                 try:
-                    if doc_info.source_type == "path":
-                        doc = Document(doc_info.source)
-                    else:
-                        doc_info.source.seek(0)
-                        doc = Document(doc_info.source)
-                        doc_info.source.seek(0)
-                    
-                    loaded_docs.append((doc_info, doc))
-                    
-                    # Actualizar estadísticas
-                    self.stats['total_paragraphs'] += len([p for p in doc.paragraphs if p.text.strip()])
-                    self.stats['total_tables'] += len(doc.tables)
-                    
+                    final_doc = self._build_altchunk_document(documents, options)
                 except Exception as e:
-                    logger.error(f"Error cargando {doc_info.name}: {e}")
-                    if options.get('stop_on_error', False):
-                        raise
-                    continue
+                    # Respaldo: si el ensamblado altChunk falla se combina con docxcompose
+                    logger.warning(f"No se pudo ensamblar con altChunk, usando docxcompose: {e}")
+                    self.stats['total_paragraphs'] = 0
+                    self.stats['total_tables'] = 0
+                    self.skipped_docs = 0
+            if final_doc is None:
+                final_doc = self._compose_documents(documents, options)
             
-            if not loaded_docs:
-                raise ValueError("No se pudieron cargar documentos válidos")
+            # Guardar directamente en disco para no retener el resultado completo en memoria
+            self._update_progress(len(documents), len(documents), "Guardando documento final...")
+            with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as tmp:
+                final_doc.save(tmp)
+                result_path = tmp.name
             
-            # El primer documento es la base
-            first_doc_info, master_doc = loaded_docs[0]
+            # Liberar los árboles XML antes de servir el archivo
+            del final_doc
+            gc.collect()
             
-            # Agregar portada si está habilitado (ANTES de crear el compositor)
-            if options.get('add_cover_page', False):
-                self._add_cover_page(master_doc, options)
-                if options.get('add_page_break', True):
-                    master_doc.add_page_break()
+            # Calcular tiempo de procesamiento
+            end_time = datetime.now()
+            self.stats['processing_time'] = (end_time - start_time).total_seconds()
+            
+            # Un resultado parcial (documentos omitidos por error) no se reutiliza
+            if cache_key and not self.skipped_docs:
+                self._store_cached_result(cache_key, result_path)
+            
+            return result_path, self.stats
+            
+        except Exception as e:
+            logger.error(f"Error en merge_documents: {e}")
+            logger.error(traceback.format_exc())
+            raise
+    
+    def _build_altchunk_document(self, documents: List[DocumentInfo], options: Dict) -> Document:
+        """
+        Construye un documento maestro mínimo que incrusta cada .docx como altChunk.
+        
+        Los documentos fuente no se parsean: cada archivo se copia tal cual como una
+        parte del paquete y Word lo integra al abrir el resultado.
+        """
+        master_doc = Document()
+        body = master_doc.element.body
+        package = master_doc.part.package
+        
+        # Word aplica a los fragmentos la configuración de página del maestro:
+        # se usa la del primer documento en lugar de la de la plantilla (Carta)
+        try:
+            sect_pr = _read_body_sectpr(documents[0]._open())
+        except Exception as e:
+            logger.warning(f"No se pudo leer la sección de {documents[0].name}: {e}")
+            sect_pr = None
+        if sect_pr is not None and body.sectPr is not None:
+            body.replace(body.sectPr, sect_pr)
+        
+        self._add_front_matter(master_doc, documents, options)
+        
+        embedded = 0
+        for idx, doc_info in enumerate(documents):
+            self._update_progress(idx, len(documents), f"Incrustando: {doc_info.name}...")
+            
+            try:
+                blob = doc_info.read_bytes()
+            except Exception as e:
+                logger.error(f"Error cargando {doc_info.name}: {e}")
+                if options.get('stop_on_error', False):
+                    raise
+                self.skipped_docs += 1
+                continue
             
-            # Crear el compositor con el documento maestro
-            composer = Composer(master_doc)
+            if embedded and options.get('add_page_break', False):
+                master_doc.add_page_break()
             
-            # Procesar documentos restantes (desde el segundo en adelante)
-            for idx, (doc_info, source_doc) in enumerate(loaded_docs[1:], start=2):
+            part = Part(
+                package.next_partname('/word/altChunks/chunk%d.docx'),
+                CT.WML_DOCUMENT,
+                blob,
+                package
+            )
+            alt_chunk = OxmlElement('w:altChunk')
+            alt_chunk.set(qn('r:id'), master_doc.part.relate_to(part, RT.A_F_CHUNK))
+            if body.sectPr is not None:
+                body.sectPr.addprevious(alt_chunk)
+            else:
+                body.append(alt_chunk)
+            embedded += 1
+            
+            # Las estadísticas salen del análisis en streaming, sin cargar el documento
+            doc_info.analyze()
+            if doc_info.is_valid:
+                self.stats['total_paragraphs'] += doc_info.paragraphs
+                self.stats['total_tables'] += doc_info.tables
+        
+        if not embedded:
+            raise ValueError("No se pudieron cargar documentos válidos")
+        
+        return master_doc
+    
+    def _compose_documents(self, documents: List[DocumentInfo], options: Dict) -> Document:
+        """Combina los documentos con docxcompose y devuelve el documento final"""
+        # Import diferido: docxcompose (y babel) solo se cargan si se usa este motor
+        from docxcompose.composer import Composer
+        
+        # Cargar TODOS los documentos primero (en paralelo) para verificar que estén bien
+        loaded_docs = []
+        
+        def load_one(doc_info: DocumentInfo):
+            try:
+                return doc_info.get_document(), None
+            except Exception as e:
+                return None, e
+        
+        with thread_pool(len(documents)) as executor:
+            # map() conserva el orden; el progreso se actualiza en el hilo principal.
+            # Se consume directamente para no retener una segunda lista de documentos
+            results = executor.map(load_one, documents)
+            for idx, (doc_info, (doc, load_error)) in enumerate(zip(documents, results)):
                 self._update_progress(
-                    idx - 1,
+                    idx,
                     len(documents),
-                    f"Combinando: {doc_info.name}..."
+                    f"Cargando: {doc_info.name}..."
                 )
                 
                 try:
-                    # Si está habilitado el salto de página, cada documento va en nueva página
-                    if options.get('add_page_break', False):
-                        # Agregar documento completo en nueva página
-                        composer.append(source_doc, break_type='page')
+                    if load_error is not None:
+                        raise load_error
+                
+                    loaded_docs.append((doc_info, doc))
+                
+                    # Actualizar estadísticas (reutiliza los conteos de analyze() si ya existen)
+                    if doc_info._analyzed and doc_info.is_valid:
+                        paragraphs, tables = doc_info.paragraphs, doc_info.tables
                     else:
-                        # Agregar documento completo sin salto de página
-                        composer.append(source_doc)
-                    
+                        paragraphs, tables = _count_body_content(doc.element.body)
+                    self.stats['total_paragraphs'] += paragraphs
+                    self.stats['total_tables'] += tables
+                
                 except Exception as e:
-                    logger.error(f"Error combinando {doc_info.name}: {e}")
+                    logger.error(f"Error cargando {doc_info.name}: {e}")
                     if options.get('stop_on_error', False):
                         raise
+                    self.skipped_docs += 1
                     continue
+        
+        # Solo loaded_docs debe mantener vivos los documentos
+        doc = load_error = results = None
+        
+        if not loaded_docs:
+            raise ValueError("No se pudieron cargar documentos válidos")
+        
+        # El primer documento es la base
+        first_doc_info, master_doc = loaded_docs[0]
+        
+        # Agregar portada e índice si están habilitados (ANTES de crear el compositor)
+        self._add_front_matter(master_doc, documents, options)
+        
+        # Crear el compositor con el documento maestro
+        composer = Composer(master_doc)
+        
+        # Procesar documentos restantes (desde el segundo en adelante)
+        for idx in range(1, len(loaded_docs)):
+            doc_info, source_doc = loaded_docs[idx]
+            # Soltar la referencia de la lista para poder liberar el documento tras combinarlo
+            loaded_docs[idx] = None
+            self._update_progress(
+                idx,
+                len(documents),
+                f"Combinando: {doc_info.name}..."
+            )
             
-            # Agregar índice si está habilitado (después de combinar todos)
-            if options.get('add_table_of_contents', False):
-                # Necesitamos agregar el índice al documento final
-                # Guardamos temporalmente, agregamos índice, y volvemos a guardar
-                temp_output = BytesIO()
-                composer.save(temp_output)
-                temp_output.seek(0)
-                
-                # Cargar el documento combinado
-                final_doc = Document(temp_output)
-                self._add_table_of_contents(final_doc, documents)
+            try:
+                # Si está habilitado el salto de página, cada documento va en nueva página
+                # Sin salto si el maestro ya termina en uno (p. ej. tras portada e índice)
+                page_break = (options.get('add_page_break', False)
+                              and not _ends_with_page_break(master_doc.element.body))
+                if not options.get('preserve_styles', True) and not _XP_HAS_PART_REFERENCES(source_doc.element.body):
+                    self._fast_append(master_doc, source_doc, page_break)
+                else:
+                    if page_break:
+                        master_doc.add_page_break()
+                    composer.append(source_doc)
                 
-                # Guardar el documento final con índice
-                output = BytesIO()
-                final_doc.save(output)
-                output.seek(0)
-                result_bytes = output.read()
-            else:
-                # Guardar en memoria usando el compositor
-                self._update_progress(len(documents), len(documents), "Guardando documento final...")
-                output = BytesIO()
-                composer.save(output)
-                output.seek(0)
-                result_bytes = output.read()
-            
-            # Calcular tiempo de procesamiento
-            end_time = datetime.now()
-            self.stats['processing_time'] = (end_time - start_time).total_seconds()
-            
-            return result_bytes, self.stats
-            
-        except Exception as e:
-            logger.error(f"Error en merge_documents: {e}")
-            logger.error(traceback.format_exc())
-            raise
+            except Exception as e:
+                logger.error(f"Error combinando {doc_info.name}: {e}")
+                if options.get('stop_on_error', False):
+                    raise
+                self.skipped_docs += 1
+                continue
+            finally:
+                # Liberar el documento fuente una vez combinado
+                doc_info._doc = None
+                del source_doc
+                if idx % GC_EVERY_N_DOCS == 0:
+                    gc.collect()
+        
+        # El maestro queda modificado por el compositor; no debe reutilizarse
+        first_doc_info._doc = None
+        
+        return composer.doc
 
 # ============================================================================
 # FUNCIONES DE UTILIDAD
@@ -331,42 +839,199 @@ def get_file_size(file_path_or_obj) -> float:
     try:
         if isinstance(file_path_or_obj, str):
             return os.path.getsize(file_path_or_obj)
-        else:
-            file_path_or_obj.seek(0, 2)
-            size = file_path_or_obj.tell()
-            file_path_or_obj.seek(0)
-            return size
-    except:
+        if hasattr(file_path_or_obj, 'getbuffer'):
+            # BytesIO / UploadedFile: tamaño del buffer interno sin mover el cursor
+            return len(file_path_or_obj.getbuffer())
+        position = file_path_or_obj.tell()
+        file_path_or_obj.seek(0, 2)
+        size = file_path_or_obj.tell()
+        file_path_or_obj.seek(position)
+        return size
+    except Exception:
         return 0
 
+@st.cache_resource
+def temp_file_registry() -> set:
+    """
+    Resultados temporales vivos en este proceso (compartido entre sesiones y reruns).
+    
+    Los que sigan en disco al cerrar el servidor (p. ej. de sesiones abandonadas)
+    se eliminan en atexit.
+    """
+    paths = set()
+    
+    def cleanup():
+        for path in list(paths):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    atexit.register(cleanup)
+    return paths
+
+def remove_temp_file(path: Optional[str]):
+    """Elimina un archivo temporal generado por la combinación, si existe"""
+    temp_file_registry().discard(path)
+    if path and os.path.exists(path):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"No se pudo eliminar el archivo temporal {path}: {e}")
+
+def default_output_name() -> str:
+    """Nombre por defecto del archivo combinado, con la fecha y hora actuales"""
+    return f"documentos_combinados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
+
+def file_size_error(name: str, size: float) -> Optional[str]:
+    """Mensaje de error si el archivo supera MAX_FILE_SIZE_MB; None si está dentro del límite"""
+    if size > MAX_FILE_SIZE_MB * 1024 * 1024:
+        return f"Archivo demasiado grande: {name} ({format_file_size(size)}, máximo {MAX_FILE_SIZE_MB} MB)"
+    return None
+
+def document_limit_error(documents: List[DocumentInfo]) -> Optional[str]:
+    """Mensaje de error si la lista supera MAX_DOCUMENTS o MAX_TOTAL_SIZE_MB; None si está dentro"""
+    if len(documents) > MAX_DOCUMENTS:
+        return (f"Se pueden combinar como máximo {MAX_DOCUMENTS} documentos "
+                f"({len(documents)} cargados). Elimina algunos de la lista.")
+    total_size = sum(d.size for d in documents)
+    if total_size > MAX_TOTAL_SIZE_MB * 1024 * 1024:
+        return (f"El tamaño total ({format_file_size(total_size)}) supera el máximo de "
+                f"{MAX_TOTAL_SIZE_MB} MB. Elimina algunos documentos de la lista.")
+    return None
+
 def validate_docx_file(file_path_or_obj) -> Tuple[bool, Optional[str]]:
-    """Valida que un archivo sea un .docx válido"""
+    """Valida que un archivo sea un .docx (zip con word/document.xml) sin parsearlo"""
     try:
-        if isinstance(file_path_or_obj, str):
-            doc = Document(file_path_or_obj)
-        else:
-            file_path_or_obj.seek(0)
-            doc = Document(file_path_or_obj)
-            file_path_or_obj.seek(0)
+        with zipfile.ZipFile(file_path_or_obj) as zf:
+            names = set(zf.namelist())
+        if 'word/document.xml' not in names or '[Content_Types].xml' not in names:
+            return False, "El archivo no contiene word/document.xml"
         return True, None
     except Exception as e:
+        # Zip corrupto, compresión no soportada, nombres ilegibles...: archivo inválido
         return False, str(e)
+    finally:
+        if not isinstance(file_path_or_obj, str):
+            file_path_or_obj.seek(0)
 
-def list_docx_in_folder(folder_path: str) -> List[str]:
-    """Lista todos los archivos .docx válidos en una carpeta"""
-    if not folder_path or not os.path.isdir(folder_path):
+@st.cache_data(show_spinner=False)
+def _validate_cached(cache_key: str, _source) -> Tuple[bool, Optional[str]]:
+    """Resultado de validate_docx_file, calculado una sola vez por archivo distinto"""
+    return validate_docx_file(_source)
+
+def worker_count(num_items: int) -> int:
+    """Número de hilos para procesar num_items archivos en paralelo"""
+    return max(1, min(8, os.cpu_count() or 4, num_items))
+
+def thread_pool(num_items: int) -> ThreadPoolExecutor:
+    """Pool de hilos con el contexto del rerun actual (las cachés de Streamlit no emiten avisos)"""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ThreadPoolExecutor(
+        max_workers=worker_count(num_items),
+        initializer=add_script_run_ctx,
+        initargs=(None, ctx)
+    )
+
+def analyze_all(documents: List[DocumentInfo]):
+    """Analiza varios documentos en paralelo (lxml libera el GIL al parsear)"""
+    if not documents:
+        return
+    with thread_pool(len(documents)) as executor:
+        list(executor.map(lambda d: d.analyze(), documents))
+
+def validate_all(sources: List, keys: Optional[List[str]] = None) -> List[Tuple[bool, Optional[str]]]:
+    """Valida varios archivos .docx en paralelo conservando el orden (keys: claves ya calculadas)"""
+    if not sources:
         return []
+    if keys is None:
+        keys = [None] * len(sources)
     
-    files = []
-    for name in os.listdir(folder_path):
-        full_path = os.path.join(folder_path, name)
-        if (name.lower().endswith(".docx") and 
-            not name.startswith("~$") and 
-            os.path.isfile(full_path)):
-            files.append(full_path)
+    def validate_one(src, key):
+        try:
+            key = key or source_cache_key(src)
+        except OSError as e:
+            # Eliminado o inaccesible después de listar la carpeta
+            return False, str(e)
+        return _validate_cached(key, src)
     
+    with thread_pool(len(sources)) as executor:
+        return list(executor.map(validate_one, sources, keys))
+
+def sync_document_order(loaded: List[DocumentInfo]) -> List[DocumentInfo]:
+    """
+    Aplica a los documentos cargados en este rerun el orden y las eliminaciones
+    guardados en la sesión. Los documentos nuevos se agregan al final.
+    """
+    # Solo se recuerdan las eliminaciones de documentos que siguen cargados
+    removed = st.session_state.removed_docs & {d.doc_id for d in loaded}
+    st.session_state.removed_docs = removed
+    pending = {d.doc_id: d for d in loaded if d.doc_id not in removed}
+    ordered = [pending.pop(d.doc_id) for d in st.session_state.documents if d.doc_id in pending]
+    return ordered + list(pending.values())
+
+# Fragmentos (Streamlit >= 1.33); en versiones anteriores la función se ejecuta normalmente
+st_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+# Descarga diferida (Streamlit >= 1.52): st.download_button acepta una función como data
+DEFERRED_DOWNLOAD = tuple(int(part) for part in st.__version__.split(".")[:2]) >= (1, 52)
+
+def render_merge_stats(panel):
+    """Muestra en el panel indicado las estadísticas de la última combinación"""
+    stats = st.session_state.merge_stats
+    if not stats:
+        panel.empty()
+        return
+    with panel.container():
+        st.metric("Documentos procesados", stats.get('total_docs', 0))
+        st.metric("Párrafos totales", stats.get('total_paragraphs', 0))
+        st.metric("Tablas totales", stats.get('total_tables', 0))
+        st.metric("Tiempo de procesamiento", f"{stats.get('processing_time', 0):.2f}s")
+
+def download_data(path: str):
+    """Contenido para st.download_button: el archivo se lee al pulsar el botón si es posible"""
+    def read() -> bytes:
+        with open(path, 'rb') as f:
+            return f.read()
+    return read if DEFERRED_DOWNLOAD else read()
+
+@st.cache_data(show_spinner=False)
+def _scan_folder(folder_path: str, signature: Tuple[int, int]) -> List[str]:
+    """
+    Rutas de los .docx de una carpeta en una sola pasada de os.scandir.
+    
+    signature (mtime, tamaño de la carpeta) solo forma parte de la clave de caché:
+    la carpeta se vuelve a recorrer cuando se agregan, eliminan o renombran archivos.
+    """
+    files = []
+    with os.scandir(folder_path) as entries:
+        for entry in entries:
+            name = entry.name
+            if (name.lower().endswith(".docx") and
+                not name.startswith("~$") and
+                entry.is_file()):
+                files.append(entry.path)
     return sorted(files)
 
+def list_docx_in_folder(folder_path: str) -> List[Tuple[str, int, str]]:
+    """
+    Lista los archivos .docx válidos en una carpeta junto con su tamaño y su clave
+    de caché (misma que source_cache_key), obtenidos de un único os.stat por archivo
+    """
+    if not folder_path or not os.path.isdir(folder_path):
+        return []
+    stat = os.stat(folder_path)
+    # Editar un archivo no cambia la carpeta: el tamaño se lee siempre del archivo
+    files = []
+    for path in _scan_folder(folder_path, (stat.st_mtime_ns, stat.st_size)):
+        try:
+            file_stat = os.stat(path)
+        except OSError:
+            # Eliminado después de recorrer la carpeta
+            continue
+        files.append((path, file_stat.st_size, f"path:{path}:{file_stat.st_mtime_ns}:{file_stat.st_size}"))
+    return files
+
 # ============================================================================
 # INICIALIZACIÓN DE SESIÓN
 # ============================================================================
@@ -375,8 +1040,21 @@ if 'documents' not in st.session_state:
     st.session_state.documents = []
 if 'doc_sources' not in st.session_state:
     st.session_state.doc_sources = {}
-if 'merged_bytes' not in st.session_state:
-    st.session_state.merged_bytes = None
+if 'removed_docs' not in st.session_state:
+    st.session_state.removed_docs = set()
+if 'doc_table_version' not in st.session_state:
+    st.session_state.doc_table_version = 0
+if 'uploader_version' not in st.session_state:
+    st.session_state.uploader_version = 0
+if 'analysis_requested' not in st.session_state:
+    st.session_state.analysis_requested = False
+if 'upload_checks' not in st.session_state:
+    st.session_state.upload_checks = {}
+if 'default_output_name' not in st.session_state:
+    # Se fija una vez: un valor por defecto que cambia en cada rerun reinicia el campo
+    st.session_state.default_output_name = default_output_name()
+if 'merged_path' not in st.session_state:
+    st.session_state.merged_path = None
 if 'merge_stats' not in st.session_state:
     st.session_state.merge_stats = None
 
@@ -393,9 +1071,22 @@ with st.sidebar:
     st.header("⚙️ Configuración")
     
     st.subheader("📋 Opciones de Combinación")
-    add_page_breaks = st.checkbox("Agregar salto de página entre documentos", value=True)
-    preserve_styles = st.checkbox("Preservar estilos originales", value=True, disabled=True, 
-                                  help="Siempre activo con docxcompose")
+    add_page_breaks = st.checkbox("Agregar salto de página entre documentos", value=DEFAULT_PAGE_BREAK)
+    preserve_styles = st.checkbox("Preservar estilos originales", value=DEFAULT_PRESERVE_STYLES,
+                                  help="Desactívalo para combinar más rápido copiando solo el contenido: "
+                                       "se aplican los estilos del primer documento. Los documentos con "
+                                       "imágenes, vínculos, notas, comentarios o listas numeradas se "
+                                       "combinan siempre con docxcompose.")
+    merge_engine = st.radio(
+        "Motor de combinación",
+        ["docxcompose", "altChunk"],
+        format_func=lambda engine: {
+            "docxcompose": "docxcompose (compatible)",
+            "altChunk": "altChunk (rápido, requiere Microsoft Word)",
+        }[engine],
+        help="altChunk incrusta cada documento sin procesarlo y Word lo integra al abrir el archivo. "
+             "LibreOffice o Google Docs pueden no mostrarlo correctamente."
+    )
     
     st.divider()
     
@@ -412,17 +1103,14 @@ with st.sidebar:
     
     st.subheader("🔧 Opciones Avanzadas")
     stop_on_error = st.checkbox("Detener en caso de error", value=False)
-    auto_analyze = st.checkbox("Analizar documentos automáticamente", value=True)
+    auto_analyze = st.checkbox("Analizar documentos automáticamente", value=DEFAULT_AUTO_ANALYZE,
+                               help="Si está desactivado, el análisis se ejecuta al pulsar 'Analizar documentos'")
     
     st.divider()
     
     st.markdown("### 📊 Estadísticas")
-    if st.session_state.merge_stats:
-        stats = st.session_state.merge_stats
-        st.metric("Documentos procesados", stats.get('total_docs', 0))
-        st.metric("Párrafos totales", stats.get('total_paragraphs', 0))
-        st.metric("Tablas totales", stats.get('total_tables', 0))
-        st.metric("Tiempo de procesamiento", f"{stats.get('processing_time', 0):.2f}s")
+    # Se completa al final del script, cuando ya se conoce el resultado de la combinación
+    stats_panel = st.empty()
 
 # Sección de carga de documentos
 st.header("📂 Cargar Documentos")
@@ -442,14 +1130,16 @@ with col2:
         folder = st.text_input(
             "Ruta de la carpeta",
             placeholder=r"C:\Users\...\Documentos",
-            help="Ingresa la ruta completa de la carpeta (solo funciona localmente)"
+            help="Ingresa la ruta completa de la carpeta (solo funciona localmente)",
+            key=f"folder_{st.session_state.uploader_version}"
         )
     else:
         uploaded = st.file_uploader(
             "Selecciona archivos .docx",
             type=["docx"],
             accept_multiple_files=True,
-            help="Puedes seleccionar múltiples archivos"
+            help="Puedes seleccionar múltiples archivos",
+            key=f"uploader_{st.session_state.uploader_version}"
         )
 
 # Procesar carga de documentos
@@ -458,24 +1148,30 @@ doc_sources = {}
 
 if mode == "📁 Desde carpeta (local)":
     if folder:
-        paths = list_docx_in_folder(folder)
-        if not paths:
+        entries = list_docx_in_folder(folder)
+        if not entries:
             st.warning("⚠️ No se encontraron archivos .docx en esa carpeta")
         else:
+            # Los archivos que superan el límite no se validan ni se cargan
+            within_limit = []
+            for path, size, cache_key in entries:
+                size_error = file_size_error(os.path.basename(path), size)
+                if size_error:
+                    st.warning(f"⚠️ {size_error}")
+                else:
+                    within_limit.append((path, size, cache_key))
+            entries = within_limit
             with st.spinner("Validando archivos..."):
-                for path in paths:
+                # Las claves salen del os.stat del listado: no se vuelve a consultar cada archivo
+                paths = [path for path, _, _ in entries]
+                keys = [cache_key for _, _, cache_key in entries]
+                for (path, size, cache_key), (is_valid, error) in zip(entries, validate_all(paths, keys)):
                     name = os.path.basename(path)
-                    is_valid, error = validate_docx_file(path)
                     
                     if is_valid:
-                        size = get_file_size(path)
-                        doc_info = DocumentInfo(name, "path", path, size)
-                        
-                        if auto_analyze:
-                            doc_info.analyze()
-                        
+                        doc_info = DocumentInfo(name, "path", path, size, doc_id=path, cache_key=cache_key)
                         docs_info.append(doc_info)
-                        doc_sources[name] = ("path", path)
+                        doc_sources[path] = ("path", path)
                     else:
                         st.warning(f"⚠️ Archivo inválido: {name} - {error}")
             
@@ -483,113 +1179,168 @@ if mode == "📁 Desde carpeta (local)":
                 st.success(f"✅ {len(docs_info)} archivo(s) válido(s) cargado(s)")
 else:
     if uploaded:
+        # Los archivos que superan el límite no se validan ni se cargan
+        within_limit = []
+        for f in uploaded:
+            size_error = file_size_error(f.name, f.size)
+            if size_error:
+                st.warning(f"⚠️ {size_error}")
+            else:
+                within_limit.append(f)
+        uploaded = within_limit
         with st.spinner("Validando archivos..."):
+            # Hash y validación se calculan una vez por subida (mismo file_id, mismo contenido)
+            known = st.session_state.upload_checks
+            pending = [f for f in uploaded if f.file_id not in known]
+            if pending:
+                # Vista en memoria propia por archivo: los hilos no comparten posición de lectura
+                buffers = [BytesIO(f.getvalue()) for f in pending]
+                hashes = [hashlib.blake2b(buffer.getbuffer(), digest_size=32).hexdigest() for buffer in buffers]
+                results = validate_all(buffers, ["blob:" + h for h in hashes])
+                for f, content_hash, (is_valid, error) in zip(pending, hashes, results):
+                    known[f.file_id] = (content_hash, is_valid, error)
+            st.session_state.upload_checks = {f.file_id: known[f.file_id] for f in uploaded}
+            
             for f in uploaded:
-                is_valid, error = validate_docx_file(f)
+                content_hash, is_valid, error = known[f.file_id]
                 
                 if is_valid:
-                    size = get_file_size(f)
-                    doc_info = DocumentInfo(f.name, "upload", f, size)
-                    
-                    if auto_analyze:
-                        doc_info.analyze()
-                    
+                    # El contenido se toma del propio UploadedFile, sin copiarlo ni volver a leerlo
+                    doc_info = DocumentInfo(f.name, "upload", f, f.size, content_hash, doc_id=f.file_id)
                     docs_info.append(doc_info)
-                    doc_sources[f.name] = ("upload", f)
+                    doc_sources[f.file_id] = ("upload", f)
                 else:
                     st.warning(f"⚠️ Archivo inválido: {f.name} - {error}")
         
         if docs_info:
             st.success(f"✅ {len(docs_info)} archivo(s) válido(s) cargado(s)")
 
-# Actualizar estado de sesión
+# Analizar todos los documentos en paralelo (los resultados quedan en caché por archivo)
+if (auto_analyze or st.session_state.analysis_requested) and docs_info:
+    with st.spinner("Analizando documentos..."):
+        analyze_all(docs_info)
+
+# Actualizar estado de sesión conservando el orden y las eliminaciones del usuario
+docs_info = sync_document_order(docs_info)
 st.session_state.documents = docs_info
 st.session_state.doc_sources = doc_sources
 
+limit_error = document_limit_error(docs_info)
+if limit_error:
+    st.error(f"❌ {limit_error}")
+
 if not docs_info:
     st.info("👆 Por favor, carga algunos documentos para comenzar")
+    render_merge_stats(stats_panel)
     st.stop()
 
 # Sección de visualización
 st.header("📋 Documentos Cargados")
 
-# Mostrar resumen
-col1, col2, col3, col4 = st.columns(4)
-total_size = sum(d.size for d in docs_info)
-total_paragraphs = sum(d.paragraphs for d in docs_info)
-total_tables = sum(d.tables for d in docs_info)
+def request_analysis():
+    """Analiza los documentos de la lista y deja el análisis activo para los siguientes reruns"""
+    st.session_state.analysis_requested = True
+    analyze_all(st.session_state.documents)
 
-with col1:
-    st.metric("Total Documentos", len(docs_info))
-with col2:
-    st.metric("Tamaño Total", format_file_size(total_size))
-with col3:
-    st.metric("Total Párrafos", total_paragraphs)
-with col4:
-    st.metric("Total Tablas", total_tables)
-
-# Lista de documentos con controles de reordenamiento
-st.subheader("🔄 Reordenar Documentos")
-
-def move_up(index):
-    if index > 0:
-        docs_info[index], docs_info[index - 1] = docs_info[index - 1], docs_info[index]
-        st.session_state.documents = docs_info
-        st.rerun()
-
-def move_down(index):
-    if index < len(docs_info) - 1:
-        docs_info[index], docs_info[index + 1] = docs_info[index + 1], docs_info[index]
-        st.session_state.documents = docs_info
-        st.rerun()
-
-def remove_doc(index):
-    doc_name = docs_info[index].name
-    docs_info.pop(index)
-    if doc_name in doc_sources:
-        del doc_sources[doc_name]
-    st.session_state.documents = docs_info
-    st.session_state.doc_sources = doc_sources
-    st.rerun()
-
-# Mostrar lista de documentos
-for idx, doc_info in enumerate(docs_info):
-    with st.container():
-        col1, col2, col3, col4, col5 = st.columns([0.4, 0.4, 5, 1.5, 0.7])
-        
-        with col1:
-            if st.button("↑", key=f"up_{idx}", disabled=(idx == 0), use_container_width=True):
-                move_up(idx)
-        
-        with col2:
-            if st.button("↓", key=f"down_{idx}", disabled=(idx == len(docs_info) - 1), use_container_width=True):
-                move_down(idx)
-        
-        with col3:
-            st.markdown(f"**{idx + 1}.** {doc_info.name}")
-            if doc_info._analyzed:
-                st.caption(f"📄 {doc_info.paragraphs} párrafos | 📊 {doc_info.tables} tablas")
-        
-        with col4:
-            st.caption(f"📦 {format_file_size(doc_info.size)}")
-        
-        with col5:
-            if st.button("❌", key=f"remove_{idx}", use_container_width=True):
-                remove_doc(idx)
-        
-        st.divider()
-
-# Vista previa del orden
-st.subheader("👀 Vista Previa del Orden Final")
-preview_text = " → ".join([f"{idx+1}. {d.name}" for idx, d in enumerate(docs_info)])
-st.info(preview_text)
+def document_table_key() -> str:
+    """Clave del editor; cambia tras aplicar cambios para que la tabla se regenere"""
+    return f"doc_table_{st.session_state.doc_table_version}"
+
+def apply_table_changes():
+    """Aplica el orden escrito en la columna # y las eliminaciones marcadas en la tabla"""
+    edited_rows = {int(row): changes for row, changes in st.session_state[document_table_key()]["edited_rows"].items()}
+    docs = st.session_state.documents
+    
+    # (posición, desempate): al subir, la fila editada queda antes de la que ocupaba
+    # esa posición; al bajar, queda después
+    positions = [(idx + 1, 0) for idx in range(len(docs))]
+    for row, changes in edited_rows.items():
+        new_pos = changes.get("#")
+        if new_pos is not None:
+            positions[row] = (new_pos, -1 if new_pos <= row + 1 else 1)
+    order = sorted(range(len(docs)), key=lambda i: (positions[i], i))
+    
+    kept = []
+    for i in order:
+        if edited_rows.get(i, {}).get("Eliminar"):
+            st.session_state.removed_docs.add(docs[i].doc_id)
+            st.session_state.doc_sources.pop(docs[i].doc_id, None)
+        else:
+            kept.append(docs[i])
+    
+    st.session_state.documents = kept
+    st.session_state.doc_table_version += 1
+
+@st_fragment
+def render_document_list():
+    """Resumen, tabla de orden y vista previa; al editarla solo se vuelve a ejecutar este bloque"""
+    # Import diferido: pandas solo hace falta cuando hay documentos que mostrar
+    import pandas as pd
+    
+    docs = st.session_state.documents
+    
+    # Mostrar resumen (aquí dentro para que refleje las eliminaciones hechas en la tabla)
+    col1, col2, col3, col4 = st.columns(4)
+    all_analyzed = all(d._analyzed for d in docs)
+    with col1:
+        st.metric("Total Documentos", len(docs))
+    with col2:
+        st.metric("Tamaño Total", format_file_size(sum(d.size for d in docs)))
+    with col3:
+        st.metric("Total Párrafos", sum(d.paragraphs for d in docs) if all_analyzed else "—")
+    with col4:
+        st.metric("Total Tablas", sum(d.tables for d in docs) if all_analyzed else "—")
+    
+    if not all_analyzed:
+        st.button("🔍 Analizar documentos", on_click=request_analysis,
+                  help="Cuenta párrafos, tablas, imágenes y saltos de página de cada documento")
+    
+    # Lista de documentos con controles de reordenamiento
+    st.subheader("🔄 Reordenar Documentos")
+    st.caption("Cambia el número de la columna **#** para mover un documento o marca **Eliminar** para quitarlo.")
+    table = pd.DataFrame([
+        {
+            "#": idx + 1,
+            "Documento": d.name,
+            "Tamaño": d.size_fmt,
+            "Párrafos": d.paragraphs if d._analyzed else None,
+            "Tablas": d.tables if d._analyzed else None,
+            "Imágenes": d.images if d._analyzed else None,
+            "Saltos de página": d.page_breaks if d._analyzed else None,
+            "Eliminar": False,
+        }
+        for idx, d in enumerate(docs)
+    ])
+    st.data_editor(
+        table,
+        key=document_table_key(),
+        on_change=apply_table_changes,
+        hide_index=True,
+        num_rows="fixed",
+        use_container_width=True,
+        disabled=["Documento", "Tamaño", "Párrafos", "Tablas", "Imágenes", "Saltos de página"],
+        column_config={
+            "#": st.column_config.NumberColumn("#", min_value=1, step=1, required=True),
+            "Eliminar": st.column_config.CheckboxColumn("Eliminar"),
+        },
+    )
+    
+    # Vista previa del orden
+    st.subheader("👀 Vista Previa del Orden Final")
+    if docs:
+        preview_text = " → ".join(f"{idx+1}. {d.name}" for idx, d in enumerate(docs))
+        st.info(preview_text)
+    else:
+        st.info("No quedan documentos en la lista")
+
+render_document_list()
 
 # Sección de combinación
 st.header("🔗 Combinar Documentos")
 
 output_name = st.text_input(
     "Nombre del archivo final",
-    value=f"documentos_combinados_{datetime.now().strftime('%Y%m%d_%H%M%S')}.docx",
+    value=st.session_state.default_output_name,
     help="El archivo se descargará con este nombre"
 )
 
@@ -600,6 +1351,7 @@ merge_options = {
     'add_cover_page': add_cover_page,
     'add_table_of_contents': add_table_of_contents,
     'stop_on_error': stop_on_error,
+    'merge_engine': 'altchunk' if merge_engine == "altChunk" else 'docxcompose',
 }
 
 if add_cover_page:
@@ -611,12 +1363,32 @@ if add_cover_page:
 progress_bar = st.progress(0)
 status_text = st.empty()
 
+last_progress_update = [0.0]
+
 def progress_callback(current, total, message):
-    """Callback para actualizar la barra de progreso"""
+    """Callback para actualizar la barra de progreso (como máximo cada PROGRESS_MIN_INTERVAL)"""
+    now = time.monotonic()
+    # El último paso se muestra siempre; los intermedios se agrupan
+    if current != total and now - last_progress_update[0] < PROGRESS_MIN_INTERVAL:
+        return
+    last_progress_update[0] = now
     progress = current / total
     progress_bar.progress(progress)
     status_text.text(f"{message} ({current}/{total})")
 
+def clear_all():
+    """Reinicia la sesión; al cambiar las claves, la carpeta y las subidas quedan vacías"""
+    st.session_state.documents = []
+    st.session_state.doc_sources = {}
+    st.session_state.removed_docs = set()
+    st.session_state.uploader_version += 1
+    st.session_state.analysis_requested = False
+    st.session_state.upload_checks = {}
+    st.session_state.default_output_name = default_output_name()
+    remove_temp_file(st.session_state.merged_path)
+    st.session_state.merged_path = None
+    st.session_state.merge_stats = None
+
 # Botón de combinación
 col1, col2 = st.columns([2, 1])
 
@@ -624,13 +1396,17 @@ with col1:
     if st.button("🧩 Combinar Documentos", type="primary", use_container_width=True):
         if not docs_info:
             st.error("❌ No hay documentos para combinar")
+        elif limit_error:
+            st.error("❌ No se puede combinar: la lista supera los límites indicados arriba")
         else:
             try:
                 merger = ProfessionalDocumentMerger(progress_callback=progress_callback)
                 
-                result_bytes, stats = merger.merge_documents(docs_info, merge_options)
+                result_path, stats = merger.merge_documents(docs_info, merge_options)
                 
-                st.session_state.merged_bytes = result_bytes
+                remove_temp_file(st.session_state.merged_path)
+                temp_file_registry().add(result_path)
+                st.session_state.merged_path = result_path
                 st.session_state.merge_stats = stats
                 st.session_state.output_name = output_name if output_name.lower().endswith(".docx") else (output_name + ".docx")
                 
@@ -649,21 +1425,16 @@ with col1:
                 logger.error(f"Error en combinación: {e}\n{traceback.format_exc()}")
 
 with col2:
-    if st.button("🔄 Limpiar Todo", use_container_width=True):
-        st.session_state.documents = []
-        st.session_state.doc_sources = {}
-        st.session_state.merged_bytes = None
-        st.session_state.merge_stats = None
-        progress_bar.empty()
-        status_text.empty()
-        st.rerun()
+    st.button("🔄 Limpiar Todo", use_container_width=True, on_click=clear_all)
+
+render_merge_stats(stats_panel)
 
 # Sección de descarga
-if st.session_state.merged_bytes:
+if st.session_state.merged_path and os.path.exists(st.session_state.merged_path):
     st.divider()
     st.header("⬇️ Descargar Resultado")
     
-    file_size = len(st.session_state.merged_bytes)
+    file_size = get_file_size(st.session_state.merged_path)
     stats = st.session_state.merge_stats or {}
     
     col1, col2, col3 = st.columns(3)
@@ -676,9 +1447,9 @@ if st.session_state.merged_bytes:
     
     st.download_button(
         "💾 Descargar Documento Combinado",
-        data=st.session_state.merged_bytes,
+        data=download_data(st.session_state.merged_path),
         file_name=st.session_state.output_name,
-        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+        mime=DOCX_MIME,
         use_container_width=True,
         type="primary"
     )
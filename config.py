@@ -19,7 +19,7 @@ LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 # Configuración de procesamiento
 DEFAULT_PAGE_BREAK = True
 DEFAULT_PRESERVE_STYLES = True
-DEFAULT_AUTO_ANALYZE = True
+DEFAULT_AUTO_ANALYZE = False
 
 # Configuración de UI
 SHOW_DETAILED_STATS = True